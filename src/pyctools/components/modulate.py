@@ -65,11 +65,12 @@ class Modulate(Transformer):
 
     def initialise(self):
         self.cell_frame = None
+        self.cell_key = None
 
     def get_cell(self, in_data):
         cell_frame = self.input_buffer['cell'].peek()
         if (cell_frame == self.cell_frame and
-                self.cell_data.shape[1:] == in_data.shape):
+                self.cell_key == (in_data.shape, in_data.dtype)):
             return True
         cell_data = cell_frame.as_numpy()
         if cell_data.ndim != 4:
@@ -79,20 +80,45 @@ class Modulate(Transformer):
         if cell_data.shape[3] not in (1, in_data.shape[2]):
             self.logger.warning('Mismatch between %d cells and %d components',
                                 cell_data.shape[3], in_data.shape[2])
-        # repeat cell to frame dimensions
+        # choose cell type so multiply doesn't need to mix types
         if in_data.dtype == cell_data.dtype:
             dtype = cell_data.dtype
+        elif in_data.dtype.kind == 'f':
+            dtype = numpy.promote_types(in_data.dtype, pt_float)
         else:
             dtype = pt_float
-        repeated_cell = numpy.empty((cell_data.shape[0],) + in_data.shape, dtype)
         d_k, d_j, d_i, d_c = cell_data.shape
+        # find any constant (all 0 or all 1) phases of the cell
+        self.cell_const = []
         for k in range(d_k):
-            for j in range(d_j):
-                for i in range(d_i):
-                    for c in range(d_c):
-                        repeated_cell[k, j::d_j, i::d_i, c::d_c] = cell_data[k, j, i, c]
+            values = numpy.unique(cell_data[k])
+            if values.size == 1 and values[0] in (0, 1):
+                self.cell_const.append(values[0])
+            else:
+                self.cell_const.append(None)
+        h, w, comps = in_data.shape
+        if h % d_j or w % d_i or comps % d_c:
+            # repeat cell to frame dimensions, using index look up tables
+            j_lut = numpy.arange(h) % d_j
+            i_lut = numpy.arange(w) % d_i
+            c_lut = numpy.arange(comps) % d_c
+            self.cell_data = cell_data.astype(dtype)[
+                :, j_lut[:, None, None], i_lut[None, :, None],
+                c_lut[None, None, :]]
+            self.blocks = None
+        else:
+            # view frame as blocks of cell size, cell is broadcast to
+            # every block
+            self.cell_data = cell_data.astype(dtype).reshape(
+                d_k, 1, d_j, 1, d_i, 1, d_c)
+            self.blocks = (h // d_j, d_j, w // d_i, d_i, comps // d_c, d_c)
+        # format cell's audit trail ready for use in every frame
+        self.cell_audit = '    cell: {\n'
+        for line in cell_frame.metadata.get('audit').splitlines():
+            self.cell_audit += '        ' + line + '\n'
+        self.cell_audit += '        }\n'
         self.cell_frame = cell_frame
-        self.cell_data = repeated_cell
+        self.cell_key = (in_data.shape, in_data.dtype)
         return True
 
     def transform(self, in_frame, out_frame):
@@ -100,12 +126,20 @@ class Modulate(Transformer):
         if not self.get_cell(in_data):
             return False
         k = in_frame.frame_no % self.cell_data.shape[0]
-        out_frame.data = in_data * self.cell_data[k]
+        if self.cell_const[k] is not None:
+            # no need to multiply
+            dtype = numpy.result_type(in_data, self.cell_data)
+            if self.cell_const[k]:
+                out_frame.data = in_data.astype(dtype, copy=False)
+            else:
+                out_frame.data = numpy.zeros(in_data.shape, dtype=dtype)
+        elif self.blocks:
+            out_frame.data = (in_data.reshape(self.blocks) *
+                              self.cell_data[k]).reshape(in_data.shape)
+        else:
+            out_frame.data = in_data * self.cell_data[k]
         audit = out_frame.metadata.get('audit')
         audit += 'data = Modulate(data)\n'
-        audit += '    cell: {\n'
-        for line in self.cell_frame.metadata.get('audit').splitlines():
-            audit += '        ' + line + '\n'
-        audit += '        }\n'
+        audit += self.cell_audit
         out_frame.metadata.set('audit', audit)
         return True
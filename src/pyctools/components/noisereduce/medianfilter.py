@@ -45,7 +45,10 @@ class MedianFilter(Transformer):
 
     The filter used is OpenCV's medianBlur_. For radius values greater
     than two the image data is converted to 8-bit. Hence the filter is
-    best used on "gamma-corrected" images rather than linear.
+    best used on "gamma-corrected" images rather than linear. If both
+    radius values are greater than two then the RGB<->YUV conversion is
+    also done in 8-bit, using OpenCV's transform_. The filtering is then
+    done entirely in 8-bit, but the output is still floating point.
 
     Config:
 
@@ -59,6 +62,7 @@ class MedianFilter(Transformer):
     .. _Rec. 709:   https://en.wikipedia.org/wiki/Rec._709
     .. _YCbCr:      https://en.wikipedia.org/wiki/YCbCr
     .. _medianBlur: https://docs.opencv.org/2.4/modules/imgproc/doc/filtering.html#medianblur
+    .. _transform:  https://docs.opencv.org/2.4/modules/core/doc/operations_on_arrays.html#transform
 
     """
 
@@ -66,57 +70,102 @@ class MedianFilter(Transformer):
         self.config['radius_Y'] = ConfigInt(value=1, min_value=0)
         self.config['radius_UV'] = ConfigInt(value=1, min_value=0)
         self.config['matrix'] = ConfigEnum(choices=('auto', '601', '709'))
+        self.buffers = {}
+        # RGB->YUV and transposed YUV->RGB matrices, ready to use
+        self.matrices = {}
+        # RGB->YUV and YUV->RGB matrices with UV offset, for cv2.transform
+        self.matrices_8bit = {}
+        offset = numpy.array([[0.0], [128.0], [128.0]])
+        for name, in_mat, out_mat in (
+                ('601', Matrices.RGBtoYUV_601, Matrices.YUVtoRGB_601),
+                ('709', Matrices.RGBtoYUV_709, Matrices.YUVtoRGB_709)):
+            self.matrices[name] = (
+                numpy.ascontiguousarray(in_mat, dtype=pt_float),
+                numpy.ascontiguousarray(out_mat.T, dtype=pt_float))
+            self.matrices_8bit[name] = (
+                numpy.hstack((in_mat, offset)),
+                numpy.hstack((out_mat, -numpy.dot(out_mat, offset))))
+
+    def buffer(self, name, shape, dtype=numpy.uint8):
+        # reuse scratch buffer from previous frame if possible
+        buf = self.buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = numpy.empty(shape, dtype=dtype)
+            self.buffers[name] = buf
+        return buf
+
+    def filter_float(self, RGB, matrix, ksize_Y, ksize_UV):
+        # matrix to YUV
+        in_mat, out_mat_T = self.matrices[matrix]
+        # compute each component as a contiguous 2-D plane, as preferred
+        # by cv2.medianBlur
+        h, w = RGB.shape[:2]
+        YUV = self.buffer('YUV', (3, h, w), pt_float)
+        numpy.dot(in_mat, RGB.reshape(-1, 3).T, out=YUV.reshape(3, -1))
+        Y, U, V = YUV
+        # convert filter inputs to 8 bit where needed
+        Y_in, U_in, V_in = Y, U, V
+        if ksize_Y > 5:
+            numpy.clip(Y, 0, 255, out=Y)
+            Y_in = self.buffer('Y', Y.shape)
+            numpy.copyto(Y_in, Y, casting='unsafe')
+        if ksize_UV > 5:
+            # add offset before converting
+            U_in = self.buffer('U', U.shape)
+            V_in = self.buffer('V', V.shape)
+            for src, dst in ((U, U_in), (V, V_in)):
+                src += pt_float(128)
+                numpy.clip(src, 0, 255, out=src)
+                numpy.copyto(dst, src, casting='unsafe')
+        # cv2.medianBlur uses OpenCV's own thread pool
+        if ksize_Y > 1:
+            Y = cv2.medianBlur(Y_in, ksize_Y)
+        if ksize_UV > 5:
+            # subtract offset
+            numpy.subtract(cv2.medianBlur(U_in, ksize_UV), 128,
+                           out=U, dtype=pt_float)
+            numpy.subtract(cv2.medianBlur(V_in, ksize_UV), 128,
+                           out=V, dtype=pt_float)
+        elif ksize_UV > 1:
+            U = cv2.medianBlur(U_in, ksize_UV)
+            V = cv2.medianBlur(V_in, ksize_UV)
+        # matrix back to RGB
+        YUV = self.buffer('YUV_out', (h, w, 3), pt_float)
+        for c, plane in enumerate((Y, U, V)):
+            YUV[:, :, c] = plane
+        return numpy.dot(YUV, out_mat_T)
 
     def transform(self, in_frame, out_frame):
         self.update_config()
         matrix = self.config['matrix']
         radius_Y = self.config['radius_Y']
         radius_UV = self.config['radius_UV']
+        ksize_Y = 1 + (radius_Y * 2)
+        ksize_UV = 1 + (radius_UV * 2)
         # check input and get data
-        RGB = in_frame.as_numpy(dtype=pt_float)
+        RGB = in_frame.as_numpy()
         if RGB.shape[2] != 3:
             self.logger.critical('Cannot process %s images with %d components',
                                  in_frame.type, RGB.shape[2])
             return False
-        # matrix to YUV
         if matrix == 'auto':
             matrix = ('601', '709')[RGB.shape[0] > 576]
-        if matrix == '601':
-            in_mat = Matrices.RGBtoYUV_601
-            out_mat = Matrices.YUVtoRGB_601
-        else:
-            in_mat = Matrices.RGBtoYUV_709
-            out_mat = Matrices.YUVtoRGB_709
-        Y = numpy.dot(RGB, in_mat[0:1].T)
-        U = numpy.dot(RGB, in_mat[1:2].T)
-        V = numpy.dot(RGB, in_mat[2:3].T)
-        # process Y
-        ksize = 1 + (radius_Y * 2)
-        if ksize > 5:
-            # convert to 8 bit
-            Y = Y.clip(0, 255).astype(numpy.uint8)
-        if ksize == 1:
-            pass
+        if min(ksize_Y, ksize_UV) > 5:
+            # do everything in 8 bit
+            in_mat, out_mat = self.matrices_8bit[matrix]
+            YUV = cv2.transform(in_frame.as_numpy(dtype=numpy.uint8), in_mat)
+            if ksize_Y == ksize_UV:
+                YUV = cv2.medianBlur(YUV, ksize_Y)
+            else:
+                YUV = cv2.merge([
+                    cv2.medianBlur(plane, ksize)
+                    for plane, ksize in zip(cv2.split(YUV),
+                                            (ksize_Y, ksize_UV, ksize_UV))])
+            # cv2.transform clips to 0..255, convert back to float
+            out_frame.data = cv2.transform(YUV, out_mat).astype(pt_float)
         else:
-            Y = cv2.medianBlur(Y, ksize)
-        # process UV
-        ksize = 1 + (radius_UV * 2)
-        if ksize > 5:
-            # add offset and convert to 8 bit
-            U += pt_float(128)
-            V += pt_float(128)
-            U = U.clip(0, 255).astype(numpy.uint8)
-            V = V.clip(0, 255).astype(numpy.uint8)
-        if ksize > 1:
-            U = cv2.medianBlur(U, ksize)
-            V = cv2.medianBlur(V, ksize)
-        if ksize > 5:
-            # subtract offset
-            U = U - pt_float(128)
-            V = V - pt_float(128)
-        # matrix back to RGB
-        YUV = numpy.dstack((Y, U, V))
-        out_frame.data = numpy.dot(YUV, out_mat.T)
+            out_frame.data = self.filter_float(
+                in_frame.as_numpy(dtype=pt_float), matrix, ksize_Y, ksize_UV)
         # add audit
         audit = out_frame.metadata.get('audit')
         audit += 'data = MedianFilter(data)\n'
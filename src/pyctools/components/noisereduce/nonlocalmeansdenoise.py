@@ -29,6 +29,24 @@ from pyctools.core.config import ConfigFloat, ConfigInt
 class NonlocalMeansDenoise(Transformer):
     """Non-local means image denoising.
 
+    This uses OpenCV's fastNlMeansDenoising_ functions. If OpenCV has
+    been built with CUDA support, and a CUDA device is present, the
+    denoising is done on the GPU.
+
+    Colour images are converted to YCrCb so the luminance and colour
+    difference can be filtered with different strengths.
+
+    ======================  =====  ====
+    Config
+    ======================  =====  ====
+    ``templateWindowSize``  int    Size of patch used to compute weights.
+    ``searchWindowSize``    int    Size of window searched for similar patches.
+    ``h_Y``                 float  Luminance filter strength.
+    ``h_UV``                float  Colour filter strength.
+    ======================  =====  ====
+
+    .. _fastNlMeansDenoising: https://docs.opencv.org/4.x/d1/d79/group__photo__denoise.html
+
     """
 
     def initialise(self):
@@ -36,6 +54,55 @@ class NonlocalMeansDenoise(Transformer):
         self.config['searchWindowSize'] = ConfigInt(value=21)
         self.config['h_Y'] = ConfigFloat(value=3.0)
         self.config['h_UV'] = ConfigFloat(value=10.0)
+        # check for CUDA support
+        try:
+            self.use_cuda = (cv2.cuda.getCudaEnabledDeviceCount() > 0 and
+                             hasattr(cv2.cuda, 'fastNlMeansDenoising'))
+        except (AttributeError, cv2.error):
+            self.use_cuda = False
+        self.buffers = {}
+        if self.use_cuda:
+            # GPU buffers are reused if frame size doesn't change
+            self.gpu_in = cv2.cuda_GpuMat()
+            self.gpu_out = cv2.cuda_GpuMat()
+
+    def denoise_cuda(self, data, h_Y, h_UV,
+                     templateWindowSize, searchWindowSize):
+        kwds = {'search_window': searchWindowSize,
+                'block_size': templateWindowSize}
+        self.gpu_in.upload(data)
+        if data.shape[-1] == 1:
+            cv2.cuda.fastNlMeansDenoising(
+                self.gpu_in, h_Y, self.gpu_out, **kwds)
+        else:
+            # same luminance and colour difference split as the CPU path
+            ycc = cv2.cuda.cvtColor(self.gpu_in, cv2.COLOR_RGB2YCrCb)
+            Y, Cr, Cb = cv2.cuda.split(ycc)
+            Y = cv2.cuda.fastNlMeansDenoising(Y, h_Y, **kwds)
+            CrCb = cv2.cuda.merge((Cr, Cb))
+            CrCb = cv2.cuda.fastNlMeansDenoising(CrCb, h_UV, **kwds)
+            Cr, Cb = cv2.cuda.split(CrCb)
+            ycc = cv2.cuda.merge((Y, Cr, Cb))
+            cv2.cuda.cvtColor(ycc, cv2.COLOR_YCrCb2RGB, self.gpu_out)
+        # OpenCV drops the component axis of 1 component images
+        return self.gpu_out.download().reshape(data.shape)
+
+    def buffer(self, name, shape, dtype=numpy.uint8):
+        # reuse scratch buffer from previous frame if possible
+        buf = self.buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = numpy.empty(shape, dtype=dtype)
+            self.buffers[name] = buf
+        return buf
+
+    def denoise_plane(self, data, h,
+                      templateWindowSize, searchWindowSize, dst=None):
+        result = cv2.fastNlMeansDenoising(
+            data, dst=dst, h=h,
+            templateWindowSize=templateWindowSize,
+            searchWindowSize=searchWindowSize)
+        # OpenCV drops the component axis of 1 component images
+        return result.reshape(data.shape)
 
     def transform(self, in_frame, out_frame):
         self.update_config()
@@ -46,20 +113,31 @@ class NonlocalMeansDenoise(Transformer):
         # get data
         data = in_frame.as_numpy(dtype=numpy.uint8)
         comps = data.shape[-1]
-        if comps == 1:
-            out_frame.data = cv2.fastNlMeansDenoising(
-                data, h=h_Y,
-                templateWindowSize=templateWindowSize,
-                searchWindowSize=searchWindowSize)
-        elif comps == 3:
-            out_frame.data = cv2.fastNlMeansDenoisingColored(
-                data, h=h_Y, hColor=h_UV,
-                templateWindowSize=templateWindowSize,
-                searchWindowSize=searchWindowSize)
-        else:
+        if comps not in (1, 3):
             self.logger.critical('Cannot denoise %s images with %d components',
                                  in_frame.type, comps)
             return False
+        if self.use_cuda:
+            out_frame.data = self.denoise_cuda(
+                data, h_Y, h_UV, templateWindowSize, searchWindowSize)
+        elif comps == 1:
+            out_frame.data = self.denoise_plane(
+                data, h_Y, templateWindowSize, searchWindowSize)
+        else:
+            # split into luminance and colour difference once, then
+            # denoise each with its own strength, using scratch buffers
+            # reused from frame to frame
+            ycc = cv2.cvtColor(data, cv2.COLOR_RGB2YCrCb,
+                               dst=self.buffer('YCrCb', data.shape))
+            for name, chans, h in (('Y', slice(0, 1), h_Y),
+                                   ('CrCb', slice(1, 3), h_UV)):
+                plane = ycc[:, :, chans]
+                plane_in = self.buffer(name + '_in', plane.shape)
+                numpy.copyto(plane_in, plane)
+                plane[...] = self.denoise_plane(
+                    plane_in, h, templateWindowSize, searchWindowSize,
+                    dst=self.buffer(name, plane.shape))
+            out_frame.data = cv2.cvtColor(ycc, cv2.COLOR_YCrCb2RGB)
         # add audit
         audit = out_frame.metadata.get('audit')
         audit += 'data = NonlocalMeansDenoise(data)\n'
@@ -16,8 +16,6 @@
 #  along with this program.  If not, see
 #  <http://www.gnu.org/licenses/>.
 
-from __future__ import print_function
-
 __all__ = ['ColourCorrect']
 __docformat__ = 'restructuredtext en'
 
@@ -54,10 +52,12 @@ class ColourCorrect(Transformer):
         self.config['G_sat'] = ConfigFloat(value=1.0, decimals=2)
         self.config['B_hue'] = ConfigFloat(decimals=2)
         self.config['B_sat'] = ConfigFloat(value=1.0, decimals=2)
+        self.matrix = None
 
-    def transform(self, in_frame, out_frame):
-        # compute colour matrix
-        self.update_config()
+    def on_set_config(self):
+        self.matrix = None
+
+    def compute_matrix(self):
         gain = self.config['gain']
         R_hue = self.config['R_hue']
         R_sat = self.config['R_sat']
@@ -65,51 +65,30 @@ class ColourCorrect(Transformer):
         G_sat = self.config['G_sat']
         B_hue = self.config['B_hue']
         B_sat = self.config['B_sat']
-        # 'hue' matrix
-        hue_matrix = numpy.array(
-            [[1.0, 0.0, 0.0],
-             [0.0, 1.0, 0.0],
-             [0.0, 0.0, 1.0]], dtype=pt_float)
-        hue_matrix += numpy.array(
-            [[ 0.0, 0.0, 0.0],
-             [ 0.5, 0.0, 0.0],
-             [-0.5, 0.0, 0.0]], dtype=pt_float) * pt_float(R_hue * R_sat)
-        hue_matrix += numpy.array(
-            [[0.0,  0.5, 0.0],
-             [0.0,  0.0, 0.0],
-             [0.0, -0.5, 0.0]], dtype=pt_float) * pt_float(G_hue * G_sat)
-        hue_matrix += numpy.array(
-            [[0.0, 0.0,  0.5],
-             [0.0, 0.0, -0.5],
-             [0.0, 0.0,  0.0]], dtype=pt_float) * pt_float(B_hue * B_sat)
+        # 'hue' matrix - only add non-zero contributions
+        hue_matrix = numpy.identity(3, dtype=pt_float)
+        if R_hue and R_sat:
+            hue_matrix[1, 0] += 0.5 * R_hue * R_sat
+            hue_matrix[2, 0] -= 0.5 * R_hue * R_sat
+        if G_hue and G_sat:
+            hue_matrix[0, 1] += 0.5 * G_hue * G_sat
+            hue_matrix[2, 1] -= 0.5 * G_hue * G_sat
+        if B_hue and B_sat:
+            hue_matrix[0, 2] += 0.5 * B_hue * B_sat
+            hue_matrix[1, 2] -= 0.5 * B_hue * B_sat
         # adjust to preserve white balance
-        hue_matrix /= numpy.array(
-            [[sum(hue_matrix[0])], [sum(hue_matrix[1])], [sum(hue_matrix[2])]],
-            dtype=pt_float)
+        hue_matrix /= hue_matrix.sum(axis=1, keepdims=True)
         # 'saturation' matrix - uses BT.709 RGB->Y as specified by sRGB
-        sat_matrix = numpy.array(
-            [[1.0, 0.0, 0.0],
-             [0.0, 1.0, 0.0],
-             [0.0, 0.0, 1.0]], dtype=pt_float)
-        sat_matrix += numpy.array(
-            [[0.2126 - 1.0, 0.0, 0.0],
-             [0.2126,       0.0, 0.0],
-             [0.2126,       0.0, 0.0]], dtype=pt_float) * pt_float(1.0 - R_sat)
-        sat_matrix += numpy.array(
-            [[0.0, 0.7152,       0.0],
-             [0.0, 0.7152 - 1.0, 0.0],
-             [0.0, 0.7152,       0.0]], dtype=pt_float) * pt_float(1.0 - G_sat)
-        sat_matrix += numpy.array(
-            [[0.0, 0.0, 0.0722],
-             [0.0, 0.0, 0.0722],
-             [0.0, 0.0, 0.0722 - 1.0]], dtype=pt_float) * pt_float(1.0 - B_sat)
+        sat_matrix = numpy.identity(3, dtype=pt_float)
+        for c, (luma, sat) in enumerate(
+                ((0.2126, R_sat), (0.7152, G_sat), (0.0722, B_sat))):
+            if sat != 1.0:
+                sat_matrix[:, c] += luma * (1.0 - sat)
+                sat_matrix[c, c] -= 1.0 - sat
         matrix = numpy.dot(hue_matrix, sat_matrix) * pt_float(gain)
-        # apply matrix
-        in_data = in_frame.as_numpy(dtype=pt_float)
-        out_frame.data = numpy.dot(in_data, matrix.T)
-        # add audit
-        audit = out_frame.metadata.get('audit')
-        audit += 'data = ColourCorrect(data)\n'
+        self.matrix = numpy.ascontiguousarray(matrix.T)
+        # audit text only changes when the matrix does
+        audit = 'data = ColourCorrect(data)\n'
         if gain != 1.0:
             audit += '    gain: {}\n'.format(gain)
         if R_hue != 0.0:
@@ -124,5 +103,19 @@ class ColourCorrect(Transformer):
             audit += '    B_hue: {}\n'.format(B_hue)
         if B_sat != 1.0:
             audit += '    B_sat: {}\n'.format(B_sat)
+        self.audit = audit
+
+    def transform(self, in_frame, out_frame):
+        self.update_config()
+        if self.matrix is None:
+            self.compute_matrix()
+        # apply matrix
+        in_data = in_frame.as_numpy(dtype=pt_float)
+        # einsum is much faster than dot when the inner dimension is 3
+        out_frame.data = numpy.einsum(
+            'hwc,ck->hwk', in_data, self.matrix, optimize=True)
+        # add audit
+        audit = out_frame.metadata.get('audit')
+        audit += self.audit
         out_frame.metadata.set('audit', audit)
         return True
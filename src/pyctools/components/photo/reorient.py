@@ -19,6 +19,10 @@
 __all__ = ['Reorient']
 __docformat__ = 'restructuredtext en'
 
+try:
+    import cv2
+except ImportError:
+    cv2 = None
 import numpy
 
 from pyctools.core.config import ConfigEnum
@@ -53,6 +57,14 @@ class Reorient(Transformer):
     __doc__ = __doc__.format(', '.join(
         ['``{}``'.format(x) for x in orientations]))
 
+    # metadata tags that may hold the orientation, in priority order
+    orientation_tags = (('Exif.Image.Orientation', 'exif_data'),
+                        ('Xmp.tiff.Orientation', 'xmp_data'))
+
+    # data types that can be reoriented with OpenCV
+    cv2_dtypes = (numpy.uint8, numpy.int8, numpy.uint16, numpy.int16,
+                  numpy.int32, numpy.float32, numpy.float64)
+
     def initialise(self):
         self.config['orientation'] = ConfigEnum(choices=self.orientations)
 
@@ -66,27 +78,21 @@ class Reorient(Transformer):
         self.update_config()
         # get orientation
         orientation = self.orientations[self.config['orientation']]
-        if not orientation:
-            orientation = 1
-            for tag, data in (
-                    ('Exif.Image.Orientation', out_frame.metadata.exif_data),
-                    ('Xmp.tiff.Orientation', out_frame.metadata.xmp_data)):
-                if tag in data:
-                    orientation = int(data[tag])
-                    break
-        # clear metadata orientation flag
-        for tag, data in (
-                ('Exif.Image.Orientation', out_frame.metadata.exif_data),
-                ('Xmp.tiff.Orientation', out_frame.metadata.xmp_data)):
+        # get and clear metadata orientation flags in one pass
+        for tag, attr in self.orientation_tags:
+            data = getattr(out_frame.metadata, attr)
             if tag in data:
+                if not orientation:
+                    orientation = int(data[tag])
                 del data[tag]
+        if not orientation:
+            orientation = 1
         # do transformation
         orient_bits = orientation - 1
         if orient_bits:
-            data = out_frame.as_numpy()
-            if orient_bits & 0b100:
-                # transpose horizontal & vertical
-                data = numpy.swapaxes(data, 0, 1)
+            data = in_frame.as_numpy()
+            # transpose horizontal & vertical
+            transpose = bool(orient_bits & 0b100)
             flip_v, flip_h = False, False
             if orient_bits & 0b010:
                 # rotate 180
@@ -95,11 +101,29 @@ class Reorient(Transformer):
             if orient_bits & 0b001:
                 # reflect left-right
                 flip_h = not flip_h
-            if flip_v:
-                data = numpy.flipud(data)
-            if flip_h:
-                data = numpy.fliplr(data)
-            out_frame.data = data
+            if (cv2 and data.ndim == 3 and data.shape[2] <= 4 and
+                    data.dtype in self.cv2_dtypes):
+                # use OpenCV's optimised copying
+                shape = data.shape
+                if transpose:
+                    data = cv2.transpose(data)
+                    shape = (shape[1], shape[0]) + shape[2:]
+                if flip_v or flip_h:
+                    data = cv2.flip(data, {(True, False): 0,
+                                           (False, True): 1,
+                                           (True, True): -1}[flip_v, flip_h])
+                # OpenCV drops the component axis of 1 component images
+                out_frame.data = data.reshape(shape)
+            else:
+                if transpose:
+                    data = numpy.swapaxes(data, 0, 1)
+                if flip_v:
+                    data = numpy.flipud(data)
+                if flip_h:
+                    data = numpy.fliplr(data)
+                # make one contiguous copy, rather than leave every
+                # downstream component to cope with negative strides
+                out_frame.data = numpy.ascontiguousarray(data)
         # add audit
         audit = out_frame.metadata.get('audit')
         audit += 'data = Reorient(data)\n'
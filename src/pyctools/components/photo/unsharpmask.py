@@ -23,7 +23,6 @@ import cv2
 import numpy
 
 from pyctools.components.interp.gaussianfilter import GaussianFilter
-from pyctools.components.interp.resizecore import resize_frame
 from pyctools.core.config import ConfigBool, ConfigFloat
 from pyctools.core.base import Transformer
 from pyctools.core.types import pt_float
@@ -47,20 +46,24 @@ class UnsharpMask(Transformer):
     detail above the threshold is reduced by the threshold value.
 
     Another option to reduce noise is ``denoise``. This uses a 5x5
-    median filter as part of the mask computation.
+    median filter as part of the mask computation. Setting
+    ``denoise_8bit`` runs the median filter on 8-bit data, which is
+    faster (especially if the input is already 8-bit) but quantises the
+    filtered image used to compute the mask.
 
     Note that this component can also be used to soften an image using a
     Gausssian filter. Set ``amount = -1``, ``threshold = 0``, and
     ``denoise = False``.
 
-    =============  =====  ====
+    ================  =====  ====
     Config
-    =============  =====  ====
-    ``amount``     float  Amount of sharpening to apply.
-    ``radius``     float  Size of blurring function.
-    ``threshold``  float  Don't sharpen low amplitude detail.
-    ``denoise``    bool   Median filter the detail to suppress noise.
-    =============  =====  ====
+    ================  =====  ====
+    ``amount``        float  Amount of sharpening to apply.
+    ``radius``        float  Size of blurring function.
+    ``threshold``     float  Don't sharpen low amplitude detail.
+    ``denoise``       bool   Median filter the detail to suppress noise.
+    ``denoise_8bit``  bool   Use 8-bit data for the median filter.
+    ================  =====  ====
 
     .. _Gaussian blurred: https://en.wikipedia.org/wiki/Gaussian_blur
     .. _unsharp mask:     https://en.wikipedia.org/wiki/Unsharp_masking
@@ -72,33 +75,56 @@ class UnsharpMask(Transformer):
         self.config['radius'] = ConfigFloat(value=2.0, decimals=1)
         self.config['threshold'] = ConfigFloat(value=0.0, decimals=1)
         self.config['denoise'] = ConfigBool()
+        self.config['denoise_8bit'] = ConfigBool()
+        self.filters = None
 
-    def transform(self, in_frame, out_frame):
-        self.update_config()
+    def on_set_config(self):
+        self.filters = None
+
+    def sharpen(self, in_frame):
         amount = self.config['amount']
         radius = self.config['radius']
         threshold = self.config['threshold']
         denoise = self.config['denoise']
         data = in_frame.as_numpy(dtype=pt_float)
         # median filter image before computing mask
-        if denoise:
-            mask = cv2.medianBlur(data, 5)
+        if denoise and self.config['denoise_8bit']:
+            mask = in_frame.as_numpy()
+            if mask.dtype != numpy.uint8:
+                # round, rather than truncate, to 8-bit
+                mask = numpy.clip(data + pt_float(0.5), 0, 255)
+                mask = mask.astype(numpy.uint8)
+            mask = cv2.medianBlur(mask, 5)
+            mask = mask.reshape(data.shape).astype(pt_float)
+        elif denoise:
+            mask = cv2.medianBlur(data, 5).reshape(data.shape)
         else:
             mask = data
-        # blur data with Gaussian and subtract to make mask
-        h_filter = GaussianFilter.core(x_sigma=radius).as_numpy(dtype=pt_float)
-        v_filter = GaussianFilter.core(y_sigma=radius).as_numpy(dtype=pt_float)
-        mask = mask - resize_frame(resize_frame(
-            mask, h_filter, 1, 1, 1, 1), v_filter, 1, 1, 1, 1)
-        # core out mask values below threshold
+        # blur data with Gaussian and subtract to make mask, use zero
+        # outside image edges as resize_frame does
+        if self.filters is None:
+            h_filter = GaussianFilter.core(x_sigma=radius)
+            v_filter = GaussianFilter.core(y_sigma=radius)
+            self.filters = (h_filter.as_numpy(dtype=pt_float).ravel(),
+                            v_filter.as_numpy(dtype=pt_float).ravel())
+        h_filter, v_filter = self.filters
+        mask = mask - cv2.sepFilter2D(
+            mask, -1, h_filter, v_filter,
+            borderType=cv2.BORDER_CONSTANT).reshape(mask.shape)
+        # core out mask values below threshold, working in place
         if threshold > 0.0:
-            mask_p = mask - pt_float(threshold)
-            mask_p *= mask_p > pt_float(0)
-            mask_n = mask + pt_float(threshold)
-            mask_n *= mask_n < pt_float(0)
-            mask = mask_p + mask_n
+            cored = numpy.absolute(mask)
+            cored -= pt_float(threshold)
+            numpy.maximum(cored, pt_float(0), out=cored)
+            mask = numpy.copysign(cored, mask, out=cored)
         # add some mask back to image
-        out_frame.data = data + (mask * amount)
+        mask *= pt_float(amount)
+        mask += data
+        return mask
+
+    def transform(self, in_frame, out_frame):
+        self.update_config()
+        out_frame.data = self.sharpen(in_frame)
         # add audit
         out_frame.set_audit(
             self, 'data = UnsharpMask(data)\n', with_config=self.config)
@@ -0,0 +1,81 @@
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2026  Pyctools contributors
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+__all__ = ['UnsharpMaskCorrect']
+__docformat__ = 'restructuredtext en'
+
+import cv2
+
+from .colourcorrect import ColourCorrect
+from .unsharpmask import UnsharpMask
+
+
+class UnsharpMaskCorrect(UnsharpMask, ColourCorrect):
+    """Unsharp mask followed by colour correction.
+
+    This does the same as a :py:class:`~.unsharpmask.UnsharpMask`
+    component followed by a :py:class:`~.colourcorrect.ColourCorrect`
+    component, but the colour correction matrix is applied in place to
+    the sharpened image. This saves allocating and writing a second
+    full size image, and passing a frame between components.
+
+    ================  =====  ====
+    Config
+    ================  =====  ====
+    ``amount``        float  Amount of sharpening to apply.
+    ``radius``        float  Size of blurring function.
+    ``threshold``     float  Don't sharpen low amplitude detail.
+    ``denoise``       bool   Median filter the detail to suppress noise.
+    ``denoise_8bit``  bool   Use 8-bit data for the median filter.
+    ``gain``          float  Adjust overall gain.
+    ``R_hue``         float  Adjust hue of red primary.
+    ``R_sat``         float  Adjust saturation of red primary.
+    ``G_hue``         float  Adjust hue of green primary.
+    ``G_sat``         float  Adjust saturation of green primary.
+    ``B_hue``         float  Adjust hue of blue primary.
+    ``B_sat``         float  Adjust saturation of blue primary.
+    ================  =====  ====
+
+    """
+
+    def initialise(self):
+        UnsharpMask.initialise(self)
+        ColourCorrect.initialise(self)
+
+    def on_set_config(self):
+        UnsharpMask.on_set_config(self)
+        ColourCorrect.on_set_config(self)
+
+    def transform(self, in_frame, out_frame):
+        self.update_config()
+        comps = in_frame.as_numpy().shape[-1]
+        if comps != 3:
+            self.logger.critical(
+                'Cannot colour correct %s images with %d components',
+                in_frame.type, comps)
+            return False
+        if self.matrix is None:
+            self.compute_matrix()
+        # sharpen to a new array, then colour correct it in place
+        data = self.sharpen(in_frame)
+        out_frame.data = cv2.transform(data, self.matrix.T, dst=data)
+        # add audit
+        out_frame.set_audit(
+            self, 'data = UnsharpMaskCorrect(data)\n',
+            with_config=self.config)
+        return True
@@ -21,7 +21,7 @@ from __future__ import print_function
 __all__ = ['VignetteCorrector', 'AnalyseVignette']
 __docformat__ = 'restructuredtext en'
 
-import inspect
+import functools
 
 import numpy
 import scipy.optimize
@@ -30,19 +30,42 @@ from pyctools.core.config import (
     ConfigBool, ConfigEnum, ConfigFloat, ConfigInt, ConfigStr)
 from pyctools.core.base import Transformer
 from pyctools.core.types import pt_float
+from .vignettecorrectorcore import apply_gain
 
 
-def radius(w, h):
+def radius_quad(w, h, squared=False, y0=0, y1=None, dtype=numpy.float64):
+    # normalised radius (or radius squared) of bottom right quadrant,
+    # the other quadrants are mirror images of it
+    # y0 & y1 select a band of rows of the quadrant
     xc = float(w - 1) / 2.0
     yc = float(h - 1) / 2.0
     r2 = (xc ** 2) + (yc ** 2)
-    index = numpy.mgrid[0 : h // 2, 0 : w // 2].astype(numpy.float64)
-    quad = numpy.sqrt((((index[1] + 0.5) ** 2) + ((index[0] + 0.5) ** 2)) / r2)
+    if y1 is None:
+        y1 = h - (h // 2)
+    # broadcast 1-D x and y arrays rather than building a 2-D grid
+    x = numpy.arange(w // 2, w, dtype=numpy.float64) - xc
+    y = numpy.arange(y0 + (h // 2), y1 + (h // 2), dtype=numpy.float64) - yc
+    x = ((x * x) / r2).astype(dtype)
+    y = ((y * y) / r2).astype(dtype)
+    result = x + y[:, None]
+    if squared:
+        return result
+    return numpy.sqrt(result)
+
+
+def mirror_quad(result):
+    # copy bottom right quadrant to the other three, the centre row and
+    # column of odd sized images are not repeated
+    h, w = result.shape[:2]
+    quad = result[h // 2 :, w // 2 :]
+    result[h // 2 :, : w // 2] = quad[:, ::-1][:, : w // 2]
+    result[: h // 2] = result[h // 2 :][::-1][: h // 2]
+
+
+def radius(w, h):
     result = numpy.ndarray((h, w), dtype=numpy.float64)
-    result[h // 2 : h, w // 2 : w] = quad
-    result[h // 2 : h, 0 : w // 2] = quad[:, ::-1]
-    result[0 : h // 2, w // 2 : w] = quad[::-1, :]
-    result[0 : h // 2, 0 : w // 2] = quad[::-1, ::-1]
+    result[h // 2 :, w // 2 :] = radius_quad(w, h)
+    mirror_quad(result)
     return result
 
 
@@ -53,10 +76,22 @@ class power(object):
     def process(x, a, b):
         return 1.0 + (a * (x ** b))
 
+    @staticmethod
+    def process_squared(x2, a, b):
+        return 1.0 + (a * (x2 ** (b / 2.0)))
+
     @staticmethod
     def analyse(x, a, b, c):
         return power.process(x, a, b) * c
 
+    @staticmethod
+    def analyse_jac(x, a, b, c):
+        # partial derivatives of analyse with respect to a, b, c
+        xb = x ** b
+        log_x = numpy.log(numpy.where(x > 0.0, x, 1.0))
+        return numpy.stack(
+            (c * xb, c * a * xb * log_x, 1.0 + (a * xb)), axis=-1)
+
     kwds = {}
 
 
@@ -65,12 +100,25 @@ class poly2(object):
 
     @staticmethod
     def process(x, a, b):
-        return 1.0 + (a * (x ** 2)) + (b * (x ** 4))
+        return poly2.process_squared(x * x, a, b)
+
+    @staticmethod
+    def process_squared(x2, a, b):
+        # Horner's method, in r^2
+        return 1.0 + (x2 * (a + (x2 * b)))
 
     @staticmethod
     def analyse(x, a, b, c):
         return poly2.process(x, a, b) * c
 
+    @staticmethod
+    def analyse_jac(x, a, b, c):
+        # partial derivatives of analyse with respect to a, b, c
+        x2 = x * x
+        x4 = x2 * x2
+        return numpy.stack(
+            (c * x2, c * x4, 1.0 + (a * x2) + (b * x4)), axis=-1)
+
     kwds = {}
 
 
@@ -79,12 +127,27 @@ class poly3(object):
 
     @staticmethod
     def process(x, a, b, c):
-        return 1.0 + (a * (x ** 2)) + (b * (x ** 4)) + (c * (x ** 6))
+        return poly3.process_squared(x * x, a, b, c)
+
+    @staticmethod
+    def process_squared(x2, a, b, c):
+        # Horner's method, in r^2
+        return 1.0 + (x2 * (a + (x2 * (b + (x2 * c)))))
 
     @staticmethod
     def analyse(x, a, b, c, d):
         return poly3.process(x, a, b, c) * d
 
+    @staticmethod
+    def analyse_jac(x, a, b, c, d):
+        # partial derivatives of analyse with respect to a, b, c, d
+        x2 = x * x
+        x4 = x2 * x2
+        x6 = x4 * x2
+        return numpy.stack(
+            (d * x2, d * x4, d * x6, 1.0 + (a * x2) + (b * x4) + (c * x6)),
+            axis=-1)
+
     kwds = {}
 
 
@@ -95,11 +158,7 @@ class lin2(object):
     def process(x, a, b, c):
         s0 = (b - 1.0) / a
         s1 = (c - b) / (1 - a)
-        f = x.flatten()
-        return numpy.piecewise(
-            f, (f <= a), (lambda x: 1.0 + (x * s0),
-                          lambda x: b + ((x - a) * s1))
-            ).reshape(x.shape)
+        return numpy.where(x <= a, 1.0 + (x * s0), b + ((x - a) * s1))
 
     @staticmethod
     def analyse(x, a, b, c, d):
@@ -136,12 +195,9 @@ class lin3(object):
         s0 = (c - 1.0) / a
         s1 = (d - c) / (b - a)
         s2 = (e - d) / (1 - b)
-        f = x.flatten()
-        return numpy.piecewise(
-            f, (f <= a, f >= b), (lambda x: 1.0 + (x * s0),
-                                  lambda x: d + ((x - b) * s2),
-                                  lambda x: c + ((x - a) * s1))
-            ).reshape(x.shape)
+        return numpy.where(x <= a, 1.0 + (x * s0),
+                           numpy.where(x >= b, d + ((x - b) * s2),
+                                       c + ((x - a) * s1)))
 
     @staticmethod
     def analyse(x, a, b, c, d, e, f):
@@ -167,9 +223,49 @@ class invlin3(object):
     kwds = lin3.kwds
 
 
+@functools.lru_cache(maxsize=1)
+def radial_bands(w, h, bands):
+    # band i is centred on radius i / (bands - 1), get each pixel's band
+    # number, and each band's pixel count and mean radius
+    r = radius(w, h)
+    band = (r * float(bands - 1)) + 0.5
+    # smallest integer type, as the band numbers stay in the cache
+    band = band.astype(numpy.min_scalar_type(bands)).ravel()
+    count = numpy.bincount(band, minlength=bands)[:bands]
+    x = numpy.bincount(band, weights=r.ravel(), minlength=bands)[:bands]
+    x /= count
+    # results are cached, so don't allow them to be modified
+    for result in band, count, x:
+        result.flags.writeable = False
+    return band, count, x
+
+
 functions = {}
 for class_ in power, poly2, poly3, lin2, lin3, invlin2, invlin3:
     functions[class_.__name__] = class_
+    # number of parameters (excluding radius) of the function
+    class_.nparams = class_.process.__code__.co_argcount - 1
+
+
+def gain_table(w, h, mode, params):
+    function = functions[mode]
+    result = numpy.ndarray((h, w, 1), dtype=pt_float)
+    quad = result[h // 2 : h, w // 2 : w, 0]
+    # compute in bands of rows so the temporary arrays stay in cache,
+    # single precision is ample for a gain applied to pt_float data
+    tile = 64
+    for y0 in range(0, quad.shape[0], tile):
+        y1 = min(y0 + tile, quad.shape[0])
+        if hasattr(function, 'process_squared'):
+            # function of r^2, no need to compute square root of radius
+            quad[y0:y1] = function.process_squared(
+                radius_quad(w, h, squared=True, y0=y0, y1=y1, dtype=pt_float),
+                *params)
+        else:
+            quad[y0:y1] = function.process(
+                radius_quad(w, h, y0=y0, y1=y1, dtype=pt_float), *params)
+    mirror_quad(result)
+    return result
 
 
 class VignetteCorrector(Transformer):
@@ -207,42 +303,59 @@ class VignetteCorrector(Transformer):
         self.config['param_2'] = ConfigFloat()
         self.config['param_3'] = ConfigFloat()
         self.config['param_4'] = ConfigFloat()
+        self.params = None
         self.gain = None
 
     def on_set_config(self):
+        self.params = None
         self.gain = None
 
-    def transform(self, in_frame, out_frame):
-        self.update_config()
-        mode = self.config['mode']
+    def set_params(self):
+        # convert config to function parameters, only when config changes
+        self.mode = self.config['mode']
         params = (self.config['param_0'],
                   self.config['param_1'],
                   self.config['param_2'],
                   self.config['param_3'],
                   self.config['param_4'])
-        func = functions[mode].process
-        arg_spec = inspect.getargspec(func)
-        params = params[:len(arg_spec.args)-1]
+        self.params = params[:functions[self.mode].nparams]
+        # with all parameters zero these functions have unity gain
+        self.bypass = (self.mode in ('power', 'poly2', 'poly3') and
+                       not any(self.params))
+        audit = 'data = VignetteCorrector(data, {})\n'.format(self.mode)
+        audit += '    function: {}\n'.format(functions[self.mode].__doc__)
+        for n, value in enumerate(self.params):
+            audit += '    {} = {}\n'.format(chr(ord('a') + n), value)
+        self.audit = audit
+
+    def transform(self, in_frame, out_frame):
+        self.update_config()
+        if self.params is None:
+            self.set_params()
         # get data
         data = in_frame.as_numpy(dtype=pt_float)
-        # generate correction function
-        h, w = data.shape[:2]
-        if self.gain is None or self.gain.shape != [h, w, 1]:
-            quad = radius(w, h)[h // 2 : h, w // 2 : w]
-            quad = func(quad, *params).astype(pt_float)
-            self.gain = numpy.ndarray((h, w, 1), dtype=pt_float)
-            self.gain[h // 2 : h, w // 2 : w, 0] = quad
-            self.gain[h // 2 : h, 0 : w // 2, 0] = quad[:, ::-1]
-            self.gain[0 : h // 2, w // 2 : w, 0] = quad[::-1, :]
-            self.gain[0 : h // 2, 0 : w // 2, 0] = quad[::-1, ::-1]
-        # apply correction
-        out_frame.data = data * self.gain
+        if self.bypass:
+            # unity gain, pass data through unchanged
+            out_frame.data = data
+        else:
+            # get correction function, only when config or frame size
+            # changes
+            h, w = data.shape[:2]
+            if self.gain is None or self.gain.shape != (h, w, 1):
+                self.gain = gain_table(w, h, self.mode, self.params)
+            # apply correction, in place if data is a new array made by
+            # converting the input
+            in_place = data is not in_frame.data
+            if data.flags.c_contiguous:
+                out_frame.data = apply_gain(
+                    data, self.gain, result=data if in_place else None)
+            elif in_place:
+                out_frame.data = numpy.multiply(data, self.gain, out=data)
+            else:
+                out_frame.data = data * self.gain
         # add audit
         audit = out_frame.metadata.get('audit')
-        audit += 'data = VignetteCorrector(data, {})\n'.format(mode)
-        audit += '    function: {}\n'.format(functions[mode].__doc__)
-        for n, value in enumerate(params):
-            audit += '    {} = {}\n'.format(chr(ord('a') + n), value)
+        audit += self.audit
         out_frame.metadata.set('audit', audit)
         return True
 
@@ -274,6 +387,7 @@ class AnalyseVignette(Transformer):
     =======================  =====  ====
     ``mode``                 str    Function to fit. Possible values: {}.
     ``method``               str    Curve fitting method: ``lm``, ``trf``, or ``dogbox``.
+    ``loss``                 str    Loss function used by ``trf`` and ``dogbox``: ``linear``, ``soft_l1``, ``huber``, ``cauchy``, or ``arctan``. Robust (not ``linear``) losses also scale steps by the Jacobian.
     ``plot_measurement``     bool   Include the measured input in the plot.
     ``plot_error``           bool   Include the residual error in the plot.
     ``plot_label_measured``  str    Label for the 'measured' plot.
@@ -294,6 +408,8 @@ class AnalyseVignette(Transformer):
         self.config['mode'] = ConfigEnum(
             choices=['measure', 'inv_measure'] + list(functions))
         self.config['method'] = ConfigEnum(choices=('lm', 'trf', 'dogbox'))
+        self.config['loss'] = ConfigEnum(
+            choices=('linear', 'soft_l1', 'huber', 'cauchy', 'arctan'))
         self.config['plot_measurement'] = ConfigBool(value=True)
         self.config['plot_error'] = ConfigBool(value=True)
         self.config['plot_label_measured'] = ConfigStr(value='measured')
@@ -303,38 +419,45 @@ class AnalyseVignette(Transformer):
         self.update_config()
         mode = self.config['mode']
         # get data
-        data = in_frame.as_numpy(dtype=numpy.float64)
-        # compute normalised radius
+        data = in_frame.as_numpy(dtype=pt_float)
+        # get radial bands
         h, w = data.shape[:2]
-        r = radius(w, h)
+        bands = 50
+        band, count, x = radial_bands(w, h, bands)
+        band = band.astype(numpy.intp)
         # calculate required gain for each radial band
         if mode != 'inv_measure':
             data = 1.0 / data
-        bands = 50
-        x = []
-        y = []
-        sigma = []
-        hi = 0.0
-        for i in range(bands):
-            lo = hi
-            hi = (float(i) + 0.5) / float(bands - 1)
-            mask = numpy.logical_and(r >= lo, r < hi)
-            x.append(numpy.mean(r[mask]))
-            y.append(numpy.mean(data[mask]))
-            sigma.append(numpy.std(data[mask]))
-        x = numpy.array(x)
-        y = numpy.array(y)
-        sigma = numpy.array(sigma)
+        comps = data.shape[-1]
+        data = data.reshape(-1, comps)
+        count = count * comps
+        y = numpy.bincount(band, weights=data.sum(axis=1),
+                           minlength=bands)[:bands]
+        y /= count
+        # second pass for the variance, subtracting the mean first keeps
+        # precision when the variance is tiny, e.g. a clean flat field
+        data = data - y[band][:, None]
+        sigma = numpy.bincount(band, weights=(data * data).sum(axis=1),
+                               minlength=bands)[:bands]
+        sigma = numpy.sqrt(sigma / count)
         # fit a function to the required gain
         if mode in ('measure', 'inv_measure'):
             pass
         else:
             fit_func = functions[mode].analyse
             method = self.config['method']
+            kwds = dict(functions[mode].kwds)
+            if hasattr(functions[mode], 'analyse_jac'):
+                # analytic Jacobian saves numerical differentiation
+                kwds['jac'] = functions[mode].analyse_jac
+            if method != 'lm' and self.config['loss'] != 'linear':
+                # robust loss reduces the effect of outlying bands,
+                # scaling steps by the Jacobian helps convergence
+                kwds['loss'] = self.config['loss']
+                kwds['x_scale'] = 'jac'
             try:
                 popt_linear, pcov_linear = scipy.optimize.curve_fit(
-                    fit_func, x, y, sigma=sigma, method=method,
-                    **functions[mode].kwds)
+                    fit_func, x, y, sigma=sigma, method=method, **kwds)
                 for n, value in enumerate(popt_linear[:-1]):
                     print('param {}: {}'.format(n, value))
             except Exception as ex:
@@ -0,0 +1,70 @@
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2026  Pyctools contributors
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+from cython.parallel import prange
+
+import numpy as np
+
+cimport cython
+cimport numpy
+
+ctypedef numpy.float32_t DTYPE_t
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def apply_gain(const DTYPE_t[:, :, ::1] data,
+               const DTYPE_t[:, :, ::1] gain, result=None):
+    """Multiply a 3-D :py:class:`numpy.ndarray` by a gain table.
+
+    This is equivalent to ``data * gain``, but the rows are shared
+    between threads.
+
+    :param numpy.ndarray data: Input image.
+
+    :param numpy.ndarray gain: Gain table, with the same height and
+        width as ``data`` and one component.
+
+    :param numpy.ndarray result: Array to store the result in. This
+        can be ``data`` itself. If ``None`` a new array is allocated.
+
+    :return: The :py:class:`numpy.ndarray` object containing the
+        result.
+
+    """
+    cdef:
+        int xlen, ylen, comps, x, y, c
+        DTYPE_t g
+        DTYPE_t[:, :, ::1] out
+    ylen = data.shape[0]
+    xlen = data.shape[1]
+    comps = data.shape[2]
+    if result is None:
+        result = np.empty((ylen, xlen, comps), dtype=np.float32)
+    out = result
+    with nogil:
+        for y in prange(ylen, schedule='static'):
+            if comps == 1:
+                # simple inner loop the compiler can vectorise
+                for x in range(xlen):
+                    out[y, x, 0] = data[y, x, 0] * gain[y, x, 0]
+            else:
+                for x in range(xlen):
+                    g = gain[y, x, 0]
+                    for c in range(comps):
+                        out[y, x, c] = data[y, x, c] * g
+    return result
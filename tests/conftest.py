@@ -0,0 +1,39 @@
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2026  Pyctools contributors
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+import pytest
+
+from pyctools.core.frame import Frame
+
+
+@pytest.fixture
+def transform():
+    """Run a Transformer component on one frame of data, without
+    starting its event loop. Returns the output frame."""
+    def run(component, data, frame_type='RGB', **config):
+        if config:
+            component.set_config(config)
+        in_frame = Frame()
+        in_frame.data = data
+        in_frame.frame_no = 0
+        in_frame.type = frame_type
+        out_frame = Frame()
+        out_frame.initialise(in_frame)
+        assert component.transform(in_frame, out_frame)
+        return out_frame
+    return run
@@ -0,0 +1,73 @@
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2026  Pyctools contributors
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+import numpy
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+from pyctools.components.noisereduce.medianfilter import MedianFilter
+from pyctools.components.colourspace.matrices import Matrices
+from pyctools.core.types import pt_float
+
+
+def reference(RGB, matrix, ksize_Y, ksize_UV):
+    # filter each YUV component separately, in float unless the kernel
+    # is too big for cv2.medianBlur to accept float data
+    in_mat = getattr(Matrices, 'RGBtoYUV_' + matrix)
+    out_mat = getattr(Matrices, 'YUVtoRGB_' + matrix)
+    YUV = numpy.dot(RGB, in_mat.T).astype(numpy.float32)
+    planes = []
+    for c, ksize in enumerate((ksize_Y, ksize_UV, ksize_UV)):
+        offset = (0.0, 128.0, 128.0)[c]
+        plane = numpy.ascontiguousarray(YUV[:, :, c])
+        if ksize > 5:
+            plane = numpy.clip(plane + offset, 0, 255).astype(numpy.uint8)
+        if ksize > 1:
+            plane = cv2.medianBlur(plane, ksize)
+        if ksize > 5:
+            plane = plane.astype(numpy.float32) - offset
+        planes.append(plane)
+    return numpy.dot(numpy.dstack(planes), out_mat.T)
+
+
+@pytest.mark.parametrize('matrix', ('601', '709'))
+@pytest.mark.parametrize('radius_Y,radius_UV', ((0, 0), (1, 2), (3, 1),
+                                                (1, 3), (3, 3), (4, 3)))
+def test_filter(transform, matrix, radius_Y, radius_UV):
+    rng = numpy.random.default_rng(0)
+    data = (rng.random((30, 40, 3)) * 255.0).astype(numpy.float32)
+    out_frame = transform(MedianFilter(), data, matrix=matrix,
+                          radius_Y=radius_Y, radius_UV=radius_UV)
+    result = out_frame.as_numpy()
+    # output is always floating point, whichever internal path is used
+    assert result.dtype == pt_float
+    assert result.shape == data.shape
+    ksize_Y = 1 + (radius_Y * 2)
+    ksize_UV = 1 + (radius_UV * 2)
+    expected = reference(data, matrix, ksize_Y, ksize_UV)
+    if min(ksize_Y, ksize_UV) > 5:
+        # input, YUV and output are all quantised to 8-bit, so allow a
+        # few levels of error, but less than one on average
+        numpy.testing.assert_allclose(result, expected, atol=3.5)
+        assert numpy.abs(result - expected).mean() < 1.0
+    else:
+        numpy.testing.assert_allclose(result, expected, atol=1.0e-3)
+    # check the filter has actually done something
+    if max(ksize_Y, ksize_UV) > 1:
+        assert numpy.abs(result - data).mean() > 1.0
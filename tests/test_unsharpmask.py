@@ -0,0 +1,117 @@
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2026  Pyctools contributors
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+import numpy
+import pytest
+
+pytest.importorskip('cv2')
+
+from pyctools.components.photo.colourcorrect import ColourCorrect
+from pyctools.components.photo.unsharpmask import UnsharpMask
+from pyctools.components.photo.unsharpmaskcorrect import UnsharpMaskCorrect
+from pyctools.core.frame import Frame
+
+
+sharpen_config = {'amount': 1.5, 'radius': 1.5, 'threshold': 2.0,
+                  'denoise': True}
+colour_config = {'gain': 1.1, 'R_hue': 0.2, 'G_sat': 0.8, 'B_hue': -0.1}
+
+
+def test_correct_matches_two_stage(transform):
+    rng = numpy.random.default_rng(0)
+    data = (rng.random((24, 32, 3)) * 255.0).astype(numpy.float32)
+    sharpened = transform(UnsharpMask(), data, **sharpen_config)
+    expected = transform(ColourCorrect(), sharpened.as_numpy(),
+                         **colour_config)
+    config = dict(sharpen_config)
+    config.update(colour_config)
+    component = UnsharpMaskCorrect()
+    for key in config:
+        assert key in component.get_config()
+    out_frame = transform(component, data, **config)
+    result = out_frame.as_numpy()
+    assert result.dtype == expected.as_numpy().dtype
+    numpy.testing.assert_allclose(
+        result, expected.as_numpy(), rtol=1.0e-5, atol=1.0e-3)
+    audit = out_frame.metadata.get('audit')
+    assert 'data = UnsharpMaskCorrect(data)' in audit
+    # config change reaches both parents
+    expected = transform(ColourCorrect(), data,
+                         **dict(colour_config, gain=2.0))
+    out_frame = transform(component, data, amount=0.0, gain=2.0)
+    numpy.testing.assert_allclose(
+        out_frame.as_numpy(), expected.as_numpy(), rtol=1.0e-5, atol=1.0e-3)
+
+
+def test_correct_rejects_grey(transform):
+    component = UnsharpMaskCorrect()
+    in_frame = Frame()
+    in_frame.data = numpy.zeros((8, 8, 1), dtype=numpy.float32)
+    in_frame.frame_no = 0
+    in_frame.type = 'Y'
+    out_frame = Frame()
+    out_frame.initialise(in_frame)
+    assert not component.transform(in_frame, out_frame)
+
+
+@pytest.mark.parametrize('comps', (1, 3))
+@pytest.mark.parametrize('denoise_8bit', (False, True))
+def test_denoise(transform, comps, denoise_8bit):
+    # one component images used to crash, as cv2.medianBlur drops the
+    # component axis
+    rng = numpy.random.default_rng(2)
+    data = (rng.random((24, 32, comps)) * 255.0).astype(numpy.float32)
+    out_frame = transform(UnsharpMask(), data,
+                          frame_type=('Y', 'RGB')[comps == 3],
+                          denoise=True, denoise_8bit=denoise_8bit)
+    result = out_frame.as_numpy()
+    assert result.shape == data.shape
+    assert result.dtype == numpy.float32
+    # audit lists non-default config values
+    audit = out_frame.metadata.get('audit')
+    assert ('denoise_8bit' in audit) == denoise_8bit
+
+
+def test_denoise_8bit_uint8_input(transform):
+    # with 8-bit input the 8-bit median filter gives the same result
+    rng = numpy.random.default_rng(3)
+    data = (rng.random((24, 32, 3)) * 255.0).astype(numpy.uint8)
+    result = {}
+    for denoise_8bit in (False, True):
+        result[denoise_8bit] = transform(
+            UnsharpMask(), data, denoise=True,
+            denoise_8bit=denoise_8bit).as_numpy()
+    numpy.testing.assert_allclose(
+        result[True], result[False], rtol=1.0e-5, atol=1.0e-3)
+
+
+def test_denoise_8bit_quantises_mask(transform):
+    # with float input the 8-bit median filter changes the result
+    # slightly, but by less than one quantisation step and without
+    # systematic bias
+    rng = numpy.random.default_rng(4)
+    data = (rng.random((24, 32, 3)) * 255.0).astype(numpy.float32)
+    result = {}
+    for denoise_8bit in (False, True):
+        result[denoise_8bit] = transform(
+            UnsharpMask(), data, amount=1.0, denoise=True,
+            denoise_8bit=denoise_8bit).as_numpy()
+    diff = result[True] - result[False]
+    assert numpy.abs(diff).max() > 0.0
+    assert numpy.abs(diff).max() < 1.0
+    assert abs(diff.mean()) < 0.02
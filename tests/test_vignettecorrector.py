@@ -0,0 +1,136 @@
+#  Pyctools - a picture processing algorithm development kit.
+#  http://github.com/jim-easterbrook/pyctools
+#  Copyright (C) 2026  Pyctools contributors
+#
+#  This program is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#  General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+import numpy
+import pytest
+
+pytest.importorskip('scipy')
+
+from pyctools.components.photo.vignettecorrector import (
+    AnalyseVignette, VignetteCorrector, functions, radius)
+from pyctools.core.frame import Frame
+
+
+params = {
+    'power':   (0.4, 2.2),
+    'poly2':   (0.3, 0.1),
+    'poly3':   (0.3, 0.1, 0.05),
+    'lin2':    (0.5, 1.2, 1.4),
+    'invlin2': (0.5, 1.2, 1.4),
+    'lin3':    (0.3, 0.6, 1.2, 1.3, 1.4),
+    'invlin3': (0.3, 0.6, 1.2, 1.3, 1.4),
+    }
+
+
+def make_config(mode):
+    config = {'mode': mode}
+    for n, value in enumerate(params[mode]):
+        config['param_{}'.format(n)] = value
+    return config
+
+
+@pytest.mark.parametrize('mode', list(functions))
+@pytest.mark.parametrize('shape', ((40, 60, 3), (41, 61, 3),
+                                   (41, 60, 1), (40, 61, 1)))
+def test_gain(transform, mode, shape):
+    # odd sized images used to fail when mirroring the quadrant
+    data = numpy.full(shape, 100.0, dtype=numpy.float32)
+    out_frame = transform(VignetteCorrector(), data, **make_config(mode))
+    result = out_frame.as_numpy()
+    assert result.shape == shape
+    assert result.dtype == numpy.float32
+    # compare with gain function computed directly at every pixel
+    h, w = shape[:2]
+    gain = functions[mode].process(radius(w, h), *params[mode])
+    numpy.testing.assert_allclose(
+        result, data * gain[:, :, None], rtol=1.0e-5)
+    # result is symmetrical
+    numpy.testing.assert_allclose(result, result[::-1], rtol=1.0e-6)
+    numpy.testing.assert_allclose(result, result[:, ::-1], rtol=1.0e-6)
+
+
+def test_radius():
+    for w, h in ((60, 40), (61, 41), (60, 41), (61, 40)):
+        r = radius(w, h)
+        y, x = numpy.mgrid[0:h, 0:w]
+        xc = float(w - 1) / 2.0
+        yc = float(h - 1) / 2.0
+        expected = numpy.hypot(x - xc, y - yc) / numpy.hypot(xc, yc)
+        numpy.testing.assert_allclose(r, expected, rtol=1.0e-12)
+
+
+class FramePool(object):
+    def get(self):
+        return Frame()
+
+
+def analyse(transform, capsys, data, **config):
+    # run AnalyseVignette, return printed parameters and function output
+    component = AnalyseVignette()
+    component.outframe_pool = {'function': FramePool()}
+    sent = {}
+    component.send = lambda name, frame: sent.__setitem__(name, frame)
+    transform(component, data, frame_type='Y', **config)
+    params = []
+    for line in capsys.readouterr().out.splitlines():
+        if line.startswith('param '):
+            params.append(float(line.split(':')[1]))
+    return params, sent['function'].as_numpy()
+
+
+def vignette(w, h, a):
+    # synthetic flat field with gain 1 / (1 + a * r^2)
+    r = radius(w, h)
+    return (200.0 / (1.0 + (a * r * r))).astype(numpy.float32)[:, :, None]
+
+
+@pytest.mark.parametrize('mode,method', (('poly2', 'lm'),
+                                         ('poly3', 'lm'),
+                                         ('power', 'lm'),
+                                         ('poly2', 'trf')))
+def test_analyse_clean(transform, capsys, mode, method):
+    # noise free input has very small variance in each band, which must
+    # not be lost to rounding
+    params, function = analyse(transform, capsys, vignette(600, 400, 0.3),
+                               mode=mode, method=method)
+    assert params[0] == pytest.approx(0.3, abs=1.0e-3)
+    if mode == 'power':
+        assert params[1] == pytest.approx(2.0, abs=1.0e-2)
+    else:
+        assert params[1:] == pytest.approx([0.0] * len(params[1:]),
+                                           abs=1.0e-2)
+    # fitted function is close to measurement
+    radius_, measured, fitted, error = function
+    assert numpy.abs(error - 1.0).max() < 1.0e-4
+
+
+@pytest.mark.parametrize('method', ('lm', 'trf', 'dogbox'))
+@pytest.mark.parametrize('loss', ('linear', 'soft_l1'))
+def test_analyse_loss(transform, capsys, method, loss):
+    # noisy vignette, with a few bright outliers
+    data = vignette(300, 200, 0.3)
+    rng = numpy.random.default_rng(0)
+    data += rng.normal(0.0, 0.5, data.shape).astype(numpy.float32)
+    data[::17, ::13] = 255.0
+    params, function = analyse(transform, capsys, data,
+                               mode='poly2', method=method, loss=loss)
+    assert len(params) == 2
+    assert params[0] == pytest.approx(0.3, abs=0.05)
+    assert params[1] == pytest.approx(0.0, abs=0.05)
+    # function output has radius, measured, fitted and error
+    assert function.shape == (4, 50)